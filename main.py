@@ -7,77 +7,77 @@ from dotenv import load_dotenv
 from src.agent.utils.logging_config import setup_logging
 from src.agent.llm.gemini_client import GeminiAgent
 
+# Load the environment once at import; repeated per-function calls re-read
+# the .env file from disk for no benefit
+load_dotenv()
 
 
+async def test_google_search(playwright_browser, config, agent, logger):
 
-async def test_google_search(browser):
-
-    logger = setup_logging()
-    
-    # Load environment variables
-    load_dotenv()
-    
-    # Initialize Gemini agent
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY not found in environment variables")
-        
-    agent = GeminiAgent(api_key)
-        
-        # Test cases
+    # Test cases
     test_commands = [
         # "go to duckduckgo and search for cars in images and open 2nd image",
         "login to github.com and search python and click the 2nd result",
         # "go to reddit.com and search for headphones",
         # "go to github and search for python projects. Open 3rd one !"
     ]
-    
-    for command in test_commands:
+
+    # Cap parallelism so we don't saturate the event loop or the machine
+    semaphore = asyncio.Semaphore(4)
+
+    async def run_one(command):
+        async with semaphore:
             logger.info(f"\nTesting command: {command}")
+            # Contexts are cheap compared to browser launches, so reuse the
+            # browser and give each command its own isolated context
+            context = await playwright_browser.new_context(**config.context_options)
+            page = await context.new_page()
+            browser = Browser(playwright_browser, context, page, config, agent)
             try:
                 await browser.interact(command)
-                # plan = await agent.plan_actions(command)
-                # if plan:
-                #     logger.info("Successfully generated plan:")
-                #     logger.info(f"Description: {plan.get('plan_description')}")
-                #     logger.info("\nSteps:")
-                #     for step in plan.get('steps', []):
-                #         logger.info(f"\nStep {step.get('step_number')}:")
-                #         logger.info(f"Description: {step.get('description')}")
-                #         logger.info(f"Action: {step.get('action')}")
-                # else:
-                #     logger.warning("Failed to generate plan")
             except Exception as e:
                 logger.error(f"Error: {str(e)}")
+            finally:
+                await context.close()
+
+    # Commands are independent, so overlap their LLM and network latency
+    await asyncio.gather(*[run_one(command) for command in test_commands])
 
 
 async def main():
     """Main entry point for testing the browser interaction."""
+    # Logging and the agent are set up exactly once here and shared by
+    # everything downstream
+    logger = setup_logging()
+
     config = BrowserConfig()
-    
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables")
+
     # Initialize the Gemini agent with API key
-    agent = GeminiAgent(api_key=os.getenv('GOOGLE_API_KEY'))
-    
+    agent = GeminiAgent.instance(api_key)
+
     async with async_playwright() as p:
         browser_type = getattr(p, config.browser_type)
-        playwright_browser = await browser_type.launch(**config.browser_launch_options)
-        context = await playwright_browser.new_context(**config.context_options)
-        page = await context.new_page()
-        
-        # Create our browser controller with Gemini agent
-        browser = Browser(playwright_browser, context, page, config, agent)
-        
+        # Launch the browser once and warm up the Gemini channel in parallel;
+        # both are independent I/O so startup costs max(A, B) instead of A + B
+        playwright_browser, _ = await asyncio.gather(
+            browser_type.launch(**config.browser_launch_options),
+            agent.warmup(),
+        )
+
         try:
             print("\n=== Testing  ===")
-            await test_google_search(browser)
-            
+            await test_google_search(playwright_browser, config, agent, logger)
+
         except Exception as e:
             print(f"An error occurred: {str(e)}")
-        
+
         finally:
             print("\nClosing browser...")
-            await browser.close()
+            await playwright_browser.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
-
@@ -1,140 +1,548 @@
+import asyncio
+import datetime
 import re
+from collections import OrderedDict, defaultdict
 from google.generativeai import GenerativeModel
 import google.generativeai as genai
+import hashlib
 import json
 import logging
-from typing import List, Dict, Optional
+import orjson
+from typing import Dict, Final, Optional, TypedDict
+
+
+class Action(TypedDict):
+    type: str
+    target: str
+    value: str
+    selectors: list
+
+
+class Step(TypedDict):
+    step_number: int
+    description: str
+    action: Action
+
+
+class Plan(TypedDict):
+    plan_description: str
+    steps: list[Step]
+
+
+class PlanBatch(TypedDict):
+    plans: list[Plan]
 
 
 logger = logging.getLogger("ai-browser-agent")
 
-class GeminiAgent:
-    """Agent that uses Gemini to plan browser actions based on user commands"""
-    
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = GenerativeModel('gemini-1.5-flash')
-        self.generation_config = {
-            "temperature": 0.2,  # Slightly higher for more descriptive plans
-            "top_p": 0.8,
-            "top_k": 40,
-            "max_output_tokens": 2048,
-        }
+# Maximum number of plans kept in the in-memory cache
+_PLAN_CACHE_SIZE = 512
 
-    async def plan_actions(self, user_command: str, page_content: Optional[str] = None) -> Dict:
-        """Generate a structured plan from natural language command"""
-        context = ""
-        if page_content:
-            if len(page_content) > 8000:
-                page_content = page_content[:8000] + "... (content truncated)"
-            context = f"\nCurrent page content: {page_content}\n"
-            
-        prompt = f"""As a browser automation expert, break down this task into clear steps:
+# Recreate the server-side prompt cache when this close to its TTL expiry
+_PROMPT_CACHE_REFRESH_MARGIN = datetime.timedelta(minutes=5)
 
-        USER COMMAND: "{user_command}"
-        {context}
+# Page-content budget for the prompt. Gemini tokens average ~4 chars, so
+# this keeps the page context around 2000 tokens.
+_MAX_CONTENT_CHARS = 8000
+
+# Minimum token-overlap (Jaccard) similarity for a near-duplicate cache hit
+_SIMILARITY_THRESHOLD = 0.75
+
+# Filler words ignored when comparing commands for similarity
+_STOPWORDS = frozenset({"a", "an", "and", "the", "to", "go", "on", "in", "for", "of"})
+
+# Patterns compiled once at import so the hot paths skip the re-cache lookup
+_TOKEN_RE = re.compile(r"[a-z0-9.]+")
+_TRAIL_COMMA_OBJ_RE = re.compile(r",\s*}")
+_TRAIL_COMMA_ARR_RE = re.compile(r",\s*]")
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style)[^>]*>.*?</\1>",
+                              re.DOTALL | re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _command_tokens(command: str) -> frozenset:
+    """Normalize a command into a set of significant tokens"""
+    words = _TOKEN_RE.findall(command.lower())
+    return frozenset(w.rstrip(".").removesuffix(".com") for w in words
+                     if w not in _STOPWORDS)
+
+
+def _compress_html(html: str) -> str:
+    """Drop script/style blocks and collapse whitespace runs
+
+    Raw DOM serializations are mostly markup noise; stripping it means the
+    truncation budget is spent on content the model can actually use.
+    """
+    html = _SCRIPT_STYLE_RE.sub("", html)
+    return _WHITESPACE_RE.sub(" ", html)
+
+
+def _truncate_page_content(content: str) -> str:
+    """Cap page content at the token budget, cutting on a tag or word boundary"""
+    if len(content) <= _MAX_CONTENT_CHARS:
+        return content
+    cut = content.rfind(">", 0, _MAX_CONTENT_CHARS) + 1
+    if cut <= 0:
+        cut = content.rfind(" ", 0, _MAX_CONTENT_CHARS)
+    if cut <= 0:
+        cut = _MAX_CONTENT_CHARS
+    return content[:cut] + "... (content truncated)"
+
+
+def _complete_steps(buffer: str) -> list:
+    """Parse the fully formed step objects out of a partial plan response"""
+    idx = buffer.find('"steps"')
+    if idx == -1:
+        return []
+    idx = buffer.find("[", idx)
+    if idx == -1:
+        return []
+
+    steps = []
+    depth = 0
+    start = -1
+    for i in range(idx + 1, len(buffer)):
+        char = buffer[i]
+        if char == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                try:
+                    steps.append(orjson.loads(buffer[start:i + 1]))
+                except orjson.JSONDecodeError:
+                    pass
+        elif char == "]" and depth == 0:
+            break
+    return steps
+
+
+def _find_json(text: str) -> Optional[str]:
+    """Return the outermost {...} block in text using a single O(n) scan"""
+    depth = 0
+    start = -1
+    for i, char in enumerate(text):
+        if char == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+# Static instruction text shared by every plan request
+_PROMPT_INSTRUCTIONS: Final[str] = """As a browser automation expert, break down this task into clear steps:
 
         For each step, if a selector is required, the system should first search the DOM using a combination of tag names, attributes, and text content before proceeding. 
-        Ensure the automation system logs each step and selector it identifies. 
+        Ensure the automation system logs each step and selector it identifies.
+        For "wait" steps, prefer a CSS selector in selectors[0] over a fixed millisecond value so execution resumes as soon as the element is ready.
         Return the plan in this exact JSON format. Make sure the JSON format is correct and doesn't contain extra text, formatting issues, or broken syntax.
 
-        Example for "login to github":
-        {{
+"""
+
+# Worked examples, kept separate so prompts can ship only the one that
+# matches the command's intent
+_EXAMPLE_LOGIN: Final[str] = """        Example for "login to github":
+        {
             "steps": [
-                {{
+                {
                     "step_number": 1,
                     "description": "Navigate to GitHub login page",
-                    "action": {{
+                    "action": {
                         "type": "navigation",
                         "target": "GitHub login page",
                         "value": "https://github.com/login",
                         "selectors": []
-                    }}
-                }},
-                {{
+                    }
+                },
+                {
                     "step_number": 2,
                     "description": "Enter username",
-                    "action": {{
+                    "action": {
                         "type": "type",
                         "target": "username field",
                         "value": "ENV:GITHUB_USERNAME",
                         "selectors": ["#login_field", "input[name='login']"]
-                    }}
-                }},
-                {{
+                    }
+                },
+                {
                     "step_number": 3,
                     "description": "Enter password",
-                    "action": {{
+                    "action": {
                         "type": "type",
                         "target": "password field",
                         "value": "ENV:GITHUB_PASSWORD",
                         "selectors": ["#password", "input[name='password']"]
-                    }}
-                }},
-                {{
+                    }
+                },
+                {
                     "step_number": 4,
                     "description": "Click sign in button",
-                    "action": {{
+                    "action": {
                         "type": "submit",
                         "target": "login form",
                         "value": "",
                         "selectors": ["input[type='submit']", "button[type='submit']"]
-                    }}
-                }}
+                    }
+                }
             ]
-        }}
+        }
 
-                Example for "go to github and search for python projects":
-        {{
+"""
+
+_EXAMPLE_SEARCH: Final[str] = """                Example for "go to github and search for python projects":
+        {
             "plan_description": "Navigate to GitHub and perform a search for Python projects",
             "steps": [
-                {{
+                {
                     "step_number": 1,
                     "description": "Navigate to GitHub homepage",
-                    "action": {{
+                    "action": {
                         "type": "navigation",
                         "target": "GitHub homepage",
                         "value": "https://github.com",
                         "selectors": []
-                    }}
-                }},
-                {{
+                    }
+                },
+                {
                     "step_number": 2,
                     "description": "Click the search box to activate it",
-                    "action": {{
+                    "action": {
                         "type": "click",
                         "target": "search box",
                         "value": "",
                         "selectors": ["[data-target='qbsearch-input.inputButton']"]
-                    }}
-                }},
-                {{
+                    }
+                },
+                {
                     "step_number": 3,
                     "description": "Type search query",
-                    "action": {{
+                    "action": {
                         "type": "type",
                         "target": "search input",
                         "value": "python projects",
                         "selectors": ["#query-builder-test"]
-                    }}
-                }},
-                {{
+                    }
+                },
+                {
                     "step_number": 4,
                     "description": "Press Enter to submit search",
-                    "action": {{
+                    "action": {
                         "type": "press",
                         "target": "keyboard",
                         "value": "Enter",
                         "selectors": []
-                    }}
-                }}
+                    }
+                }
             ]
-        }}
+        }
+"""
+
+# Full static prefix (instructions + both examples). It contains no
+# placeholders so it can be uploaded verbatim to Gemini's context cache.
+_PROMPT_STATIC: Final[str] = _PROMPT_INSTRUCTIONS + _EXAMPLE_LOGIN + _EXAMPLE_SEARCH
+
+def _select_examples(user_command: str) -> str:
+    """Return only the worked example(s) matching the command's intent"""
+    lowered = user_command.lower()
+    if "login" in lowered or "sign in" in lowered:
+        return _EXAMPLE_LOGIN
+    if "search" in lowered:
+        return _EXAMPLE_SEARCH
+    return _EXAMPLE_LOGIN + _EXAMPLE_SEARCH
 
 
+# Dynamic tail interpolated per call and appended after the static prefix
+_PROMPT_TAIL: Final[str] = """
+        USER COMMAND: "{user_command}"
+        {context}
+
         Provide a complete plan with all necessary steps to accomplish: {user_command}
         """
 
+# Tail used when several commands are planned in one request
+_BATCH_TAIL: Final[str] = """
+        USER COMMANDS:
+        {commands}
+
+        Provide a complete plan for every command. Return a single JSON object
+        of the form {{"plans": [...]}} with one plan (in the exact format
+        above) per command, in the same order as the commands.
+        """
+
+
+class GeminiAgent:
+    """Agent that uses Gemini to plan browser actions based on user commands"""
+
+    __slots__ = ("model", "generation_config", "max_concurrency", "_plan_cache",
+                 "_cached_tokens", "_plan_locks", "_prompt_cache",
+                 "_prompt_cache_failed")
+
+    # Shared instances keyed by api_key so the gRPC channel and its TLS
+    # handshake are paid for once per process
+    _instances: Dict[int, "GeminiAgent"] = {}
+
+    @classmethod
+    def instance(cls, api_key: str) -> "GeminiAgent":
+        """Return the shared agent for this api_key, creating it on first use"""
+        key = hash(api_key)
+        agent = cls._instances.get(key)
+        if agent is None:
+            agent = cls(api_key)
+            cls._instances[key] = agent
+        return agent
+
+    def __init__(self, api_key: str, max_concurrency: int = 8):
+        genai.configure(api_key=api_key, transport="grpc_asyncio")
+        self.model = GenerativeModel('gemini-1.5-flash')
+        # Ceiling on in-flight Gemini requests from plan_actions_many
+        self.max_concurrency = max_concurrency
+        self.generation_config = {
+            "temperature": 0.1,
+            # Real plans run 6-8 steps (~400 tokens); latency and cost scale
+            # with the output budget, so cap well below the model default
+            "max_output_tokens": 600,
+            # Ask the server for syntactically valid JSON up front,
+            # constrained to the Plan shape
+            "response_mime_type": "application/json",
+            "response_schema": Plan,
+        }
+        # Cache of previously generated plans keyed by normalized command
+        self._plan_cache: OrderedDict = OrderedDict()
+        # Token sets of cached commands, for near-duplicate lookups
+        self._cached_tokens: Dict[bytes, frozenset] = {}
+        # Per-key locks so concurrent misses on the same command coalesce
+        self._plan_locks = defaultdict(asyncio.Lock)
+        # Server-side cache of the static prompt prefix, created lazily
+        self._prompt_cache = None
+        self._prompt_cache_failed = False
+
+    def _ensure_prompt_cache(self):
+        """Back the model with Gemini's context cache for the static prefix
+
+        Creates the CachedContent on first use and recreates it shortly
+        before its TTL runs out so in-flight requests never reference an
+        expired cache.
+        """
+        if self._prompt_cache_failed:
+            return
+        if self._prompt_cache is not None:
+            expire_time = getattr(self._prompt_cache, "expire_time", None)
+            if expire_time is None:
+                return
+            remaining = expire_time - datetime.datetime.now(datetime.timezone.utc)
+            if remaining > _PROMPT_CACHE_REFRESH_MARGIN:
+                return
+            # Close to expiry — drop it and create a fresh cache below
+            self._prompt_cache = None
+        try:
+            self._prompt_cache = genai.caching.CachedContent.create(
+                model="models/gemini-1.5-flash-001",
+                contents=[_PROMPT_STATIC],
+                ttl=datetime.timedelta(hours=1),
+            )
+            self.model = GenerativeModel.from_cached_content(
+                cached_content=self._prompt_cache
+            )
+            logger.info("Created Gemini context cache for the static prompt prefix")
+        except Exception as e:
+            # Context caching is best-effort; keep sending the full prompt
+            # when the API or model version doesn't support it
+            logger.warning(f"Context caching unavailable, sending full prompt: {e}")
+            self._prompt_cache_failed = True
+
+    def _similar_cached_plan(self, user_command: str) -> Optional[Dict]:
+        """Find a cached plan whose command is a near-duplicate of this one"""
+        tokens = _command_tokens(user_command)
+        if not tokens:
+            return None
+        best_key = None
+        best_score = _SIMILARITY_THRESHOLD
+        for key, cached in self._cached_tokens.items():
+            score = len(tokens & cached) / len(tokens | cached)
+            if score >= best_score:
+                best_key = key
+                best_score = score
+        if best_key is None:
+            return None
+        logger.info(f"Found similar cached plan (similarity {best_score:.2f})")
+        return self._plan_cache.get(best_key)
+
+    def _plan_cache_key(self, user_command: str, page_content: Optional[str] = None) -> bytes:
+        """Build a cache key from the normalized command and full page content"""
+        material = f"{user_command.strip().lower()}\x00{page_content or ''}"
+        return hashlib.blake2b(material.encode(), digest_size=16).digest()
+
+    async def warmup(self):
+        """Prime the channel to Gemini with a tiny throwaway request
+
+        Meant to run concurrently with other startup work (e.g. the browser
+        launch) so the TLS/HTTP2 setup cost is off the first real plan.
+        """
+        try:
+            await self.model.generate_content_async(
+                "ping",
+                generation_config={"max_output_tokens": 1}
+            )
+        except Exception as e:
+            # Warmup is purely opportunistic
+            logger.debug(f"Warmup request failed: {e}")
+
+    def _build_prompt(self, user_command: str, page_content: Optional[str] = None) -> str:
+        """Assemble the prompt for a command, honoring the server-side prefix cache"""
+        context = ""
+        if page_content:
+            page_content = _truncate_page_content(_compress_html(page_content))
+            context = f"\nCurrent page content: {page_content}\n"
+
+        # With a server-side prompt cache only the dynamic tail is sent;
+        # otherwise prepend the instructions plus the example(s) relevant to
+        # this command's intent
+        self._ensure_prompt_cache()
+        prompt = _PROMPT_TAIL.format_map(
+            {"user_command": user_command, "context": context})
+        if self._prompt_cache is None:
+            prompt = _PROMPT_INSTRUCTIONS + _select_examples(user_command) + prompt
+        return prompt
+
+    async def plan_actions_stream(self, user_command: str, page_content: Optional[str] = None):
+        """Yield plan steps as Gemini generates them instead of awaiting the full plan
+
+        Callers that execute steps one at a time can start the first action
+        (usually a navigation) while later steps are still being generated.
+        """
+        cache_key = self._plan_cache_key(user_command, page_content)
+        cached_plan = self._plan_cache.get(cache_key)
+        if cached_plan is not None:
+            self._plan_cache.move_to_end(cache_key)
+            for step in cached_plan.get("steps", []):
+                yield step
+            return
+
+        prompt = self._build_prompt(user_command, page_content)
+
+        logger.info(f"Streaming plan for command: {user_command}")
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config=self.generation_config,
+            stream=True
+        )
+
+        buffer = ""
+        steps = []
+        async for chunk in response:
+            buffer += chunk.text
+            parsed = _complete_steps(buffer)
+            for step in parsed[len(steps):]:
+                steps.append(step)
+                yield step
+
+        if steps:
+            self._plan_cache[cache_key] = {"steps": steps}
+            if len(self._plan_cache) > _PLAN_CACHE_SIZE:
+                evicted_key, _ = self._plan_cache.popitem(last=False)
+                self._cached_tokens.pop(evicted_key, None)
+
+    async def plan_actions_many(self, items: list) -> list:
+        """Plan many commands concurrently, one Gemini request per command
+
+        items holds commands or (command, page_content) pairs. Requests run
+        under a semaphore of max_concurrency, so total latency approaches the
+        slowest request instead of the sum. Each item still goes through
+        plan_actions and therefore benefits from the plan cache.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _one(item):
+            command, page_content = item if isinstance(item, tuple) else (item, None)
+            async with semaphore:
+                return await self.plan_actions(command, page_content)
+
+        return await asyncio.gather(*[_one(item) for item in items])
+
+    async def plan_actions_batch(self, commands: list) -> list:
+        """Plan several commands in one Gemini request
+
+        Amortizes the network round-trip and the static prompt prefix over
+        all commands. Returns one plan (or None) per command, in order.
+        """
+        if not commands:
+            return []
+
+        numbered = "\n        ".join(f'{i}) "{c}"' for i, c in enumerate(commands, 1))
+
+        self._ensure_prompt_cache()
+        prompt = _BATCH_TAIL.format_map({"commands": numbered})
+        if self._prompt_cache is None:
+            prompt = _PROMPT_STATIC + prompt
+
+        # Scale the output budget with the number of plans requested and
+        # constrain the response to the batched shape
+        generation_config = dict(self.generation_config)
+        generation_config["max_output_tokens"] = \
+            self.generation_config["max_output_tokens"] * len(commands)
+        generation_config["response_schema"] = PlanBatch
+
+        try:
+            logger.info(f"Generating batched plan for {len(commands)} commands")
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=generation_config
+            )
+            parsed = getattr(response, "parsed", None)
+            if not parsed:
+                parsed = self._extract_json_from_text(response.text.strip())
+        except Exception as e:
+            logger.error(f"Error generating batched plan: {e}")
+            return [None] * len(commands)
+
+        plans = parsed.get("plans") or []
+        results = []
+        for i, command in enumerate(commands):
+            plan = plans[i] if i < len(plans) else None
+            if not plan or not plan.get("steps"):
+                logger.warning(f"No steps in batched plan for command: {command}")
+                results.append(None)
+                continue
+            # Seed the plan cache so later single-command calls hit it
+            cache_key = self._plan_cache_key(command)
+            self._plan_cache[cache_key] = plan
+            self._cached_tokens[cache_key] = _command_tokens(command)
+            results.append(plan)
+        return results
+
+    async def plan_actions(self, user_command: str, page_content: Optional[str] = None) -> Dict:
+        """Generate a structured plan from natural language command"""
+        # Return a cached plan if we have already planned this command
+        cache_key = self._plan_cache_key(user_command, page_content)
+        cached_plan = self._plan_cache.get(cache_key)
+        if cached_plan is not None:
+            self._plan_cache.move_to_end(cache_key)
+            logger.info(f"Using cached plan for command: {user_command}")
+            return cached_plan
+
+        # Fall back to a near-duplicate match for paraphrased commands
+        if not page_content:
+            similar_plan = self._similar_cached_plan(user_command)
+            if similar_plan is not None:
+                return similar_plan
+
+        # Per-key lock so concurrent tasks planning the same command make
+        # one Gemini call between them instead of a thundering herd
+        async with self._plan_locks[cache_key]:
+            cached_plan = self._plan_cache.get(cache_key)
+            if cached_plan is not None:
+                return cached_plan
+            return await self._plan_uncached(user_command, page_content, cache_key)
+
+    async def _plan_uncached(self, user_command, page_content, cache_key) -> Dict:
+        """Call Gemini for a plan and store it under cache_key"""
+        prompt = self._build_prompt(user_command, page_content)
+
         try:
             logger.info(f"Generating plan for command: {user_command}")
             response = await self.model.generate_content_async(
@@ -142,18 +550,32 @@ class GeminiAgent:
                 generation_config=self.generation_config
             )
             
-            # Extract and clean the response
-            content = response.text.strip()
-            logger.debug(f"Raw LLM response:\n{content}")
-            
-            # Parse the plan
-            plan = self._extract_json_from_text(content)
-            logger.info(f"Generated plan:\n{json.dumps(plan, indent=2)}")
+            # The schema-constrained response is parsed server-side; fall
+            # back to the text extractor when .parsed is unavailable
+            plan = getattr(response, "parsed", None)
+            if not plan:
+                content = response.text.strip()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Raw LLM response:\n%s", content)
+                plan = self._extract_json_from_text(content)
+            # json.dumps(indent=2) is costly, so only pretty-print when the
+            # debug level is actually enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Generated plan:\n%s",
+                             orjson.dumps(plan, option=orjson.OPT_INDENT_2).decode())
             
             if not plan.get("steps"):
                 logger.warning("No steps found in generated plan")
                 return None
-            
+
+            # Store the plan so identical commands skip the LLM round-trip
+            self._plan_cache[cache_key] = plan
+            if not page_content:
+                self._cached_tokens[cache_key] = _command_tokens(user_command)
+            if len(self._plan_cache) > _PLAN_CACHE_SIZE:
+                evicted_key, _ = self._plan_cache.popitem(last=False)
+                self._cached_tokens.pop(evicted_key, None)
+
             return plan
             
         except Exception as e:
@@ -169,18 +591,40 @@ class GeminiAgent:
 
     def _extract_json_from_text(self, text: str) -> dict:
         """Extract JSON from text response"""
-        cleaned_response = re.sub(r"```json|```", "", text).strip()
-    
-    # Step 2: Remove trailing commas that might break JSON parsing
-        cleaned_response = re.sub(r",\s*}", "}", cleaned_response)
-        cleaned_response = re.sub(r",\s*]", "]", cleaned_response)
-        
+        # Fast path: responses requested as application/json usually parse
+        # as-is, with no fences or noise to clean up
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+
+        # Strip code fences without regex, then locate the outermost object
+        # with a single left-to-right scan
+        cleaned_response = text.strip().removeprefix("```json").removesuffix("```").strip()
+        json_block = _find_json(cleaned_response)
+        if json_block is None:
+            logging.error("No JSON object found in LLM response")
+            return {}
+
         try:
-            # Step 3: Attempt to parse the cleaned JSON string
-            parsed_data = json.loads(cleaned_response)
+            parsed_data = orjson.loads(json_block)
             logging.info("Successfully parsed LLM response to JSON.")
             return parsed_data
-        except json.JSONDecodeError as e:
-            logging.error(f"JSON decoding error: {e}")
-            return {}  
+        except orjson.JSONDecodeError:
+            # Repair trailing commas only when a clean parse fails
+            repaired = _TRAIL_COMMA_OBJ_RE.sub("}", json_block)
+            repaired = _TRAIL_COMMA_ARR_RE.sub("]", repaired)
+            try:
+                # orjson is stricter than stdlib json, so fall back to it
+                # for anything orjson still rejects
+                return orjson.loads(repaired)
+            except orjson.JSONDecodeError:
+                pass
+            try:
+                parsed_data = json.loads(repaired)
+                logging.info("Successfully parsed LLM response to JSON after repair.")
+                return parsed_data
+            except json.JSONDecodeError as e:
+                logging.error(f"JSON decoding error: {e}")
+                return {}
 
@@ -0,0 +1,68 @@
+from operator import itemgetter
+import logging
+import time
+
+logger = logging.getLogger("ai-browser-agent")
+
+# How long a cached search result stays valid, in seconds
+_CACHE_TTL = 300
+
+# Fields kept from each raw search result, extracted with one itemgetter
+# call per item instead of four .get() dispatches
+_RESULT_FIELDS = ("title", "link", "snippet", "displayLink")
+_RESULT_GETTER = itemgetter(*_RESULT_FIELDS)
+_RESULT_DEFAULTS = {field: "" for field in _RESULT_FIELDS}
+
+class GoogleSearchAPI:
+    """Wrapper around the Google Custom Search JSON API."""
+
+    def __init__(self, api_key: str, cse_id: str):
+        # googleapiclient.discovery drags in httplib2 and the discovery
+        # cache machinery (~200ms); defer it to first construction
+        from googleapiclient.discovery import build
+
+        self.api_key = api_key
+        self.cse_id = cse_id
+        # Building the client normally fetches and parses a ~50KB discovery
+        # document. Do it once here, from the bundled static document, so
+        # construction never hits the network and searches reuse the service
+        self._service = build(
+            "customsearch", "v1",
+            developerKey=api_key,
+            cache_discovery=False,
+            static_discovery=True
+        )
+        # Repeat queries are common in planning loops and cost ~200ms plus
+        # daily quota each; keep recent responses for _CACHE_TTL seconds
+        self._cache: dict = {}
+
+    def search(self, query: str, **kwargs) -> dict:
+        """Run a search query and return the raw API response."""
+        key = (query, tuple(sorted(kwargs.items())))
+        cached = self._cache.get(key)
+        if cached is not None:
+            stored_at, result = cached
+            if time.monotonic() - stored_at < _CACHE_TTL:
+                logger.info("Search cache hit for: %s", query)
+                return result
+            del self._cache[key]
+
+        logger.info("Searching Google for: %s", query)
+        result = (
+            self._service.cse()
+            .list(q=query, cx=self.cse_id, **kwargs)
+            .execute()
+        )
+        self._cache[key] = (time.monotonic(), result)
+        return result
+
+    def search_items(self, query: str, **kwargs) -> list:
+        """Run a search and return its items in a compact form."""
+        return self._format_results(self.search(query, **kwargs))
+
+    @staticmethod
+    def _format_results(raw_results: dict) -> list:
+        return [
+            dict(zip(_RESULT_FIELDS, _RESULT_GETTER({**_RESULT_DEFAULTS, **item})))
+            for item in raw_results.get("items", ())
+        ]
@@ -1,18 +1,29 @@
 import logging
+import os
 import sys
 
 def setup_logging():
     """Configure logging for the application."""
     # Create a logger
     logger = logging.getLogger("ai-browser-agent")
-    
-    # Set the logging level to DEBUG to see all logs
-    logger.setLevel(logging.DEBUG)
-    
+
+    # Already configured — repeated calls must not stack handlers, which
+    # would emit (and format) every log line multiple times
+    if any(isinstance(h, logging.StreamHandler) for h in logger.handlers):
+        return logger
+
+    # Keep noisy per-action DEBUG lines out of normal runs; stdout writes
+    # are synchronous and add up fast
+    level = logging.DEBUG if os.getenv("AGENT_DEBUG") else logging.INFO
+    logger.setLevel(level)
+    # Records are fully handled here; propagating to the root logger would
+    # emit every line twice
+    logger.propagate = False
+
     # Create console handler with formatting
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.DEBUG)
-    
+    console_handler.setLevel(level)
+
     # Create formatter
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -1,17 +1,67 @@
-from playwright.async_api import Page, Browser as PlaywrightBrowser, BrowserContext
-from typing import Optional, Dict
+from __future__ import annotations
+
+from typing import Optional, Dict, TYPE_CHECKING
 from .config import BrowserConfig
 from .interaction.errors import BrowserError
 from .interaction.parser import CommandParser
 from .interaction.element_finder import ElementFinder
 from .interaction.executor import CommandExecutor
-import re
 import random
 import asyncio
 import logging
 
+if TYPE_CHECKING:
+    from playwright.async_api import Page, Browser as PlaywrightBrowser, BrowserContext
+
 logger = logging.getLogger("ai-browser-agent")
 
+# Known ad/tracking domains blocked during routing
+_BLOCKED_HOSTS = frozenset({
+    "google-analytics.com",
+    "doubleclick.net",
+    "facebook.com",
+    "adnxs.com",
+    # Add more ad domains as needed
+})
+
+# File extensions standing in for the blockable resource types in
+# BrowserConfig.block_resources; "other" has no extension signature and
+# is left alone
+_RESOURCE_EXTENSIONS = {
+    "image": ("png", "jpg", "jpeg", "gif", "webp", "svg", "ico"),
+    "media": ("mp4", "webm", "ogg", "mp3", "wav"),
+    "font": ("woff", "woff2", "ttf", "otf", "eot"),
+}
+
+
+async def _abort_route(route):
+    await route.abort()
+
+# Actions a human would visibly pause after; waits already pause by
+# definition, so padding them with more sleep is pure overhead
+_HUMAN_DELAY_ACTIONS = frozenset({"click", "type", "submit", "press"})
+
+# Common cookie consent buttons. The old XPath-style
+# button[contains(text(), ...)] entries never matched as CSS and are
+# expressed with Playwright's :has-text() instead.
+_COOKIE_SELECTORS = (
+    '[id*="cookie"] button',
+    '[class*="cookie"] button',
+    '[id*="consent"] button',
+    '[class*="consent"] button',
+    'button:has-text("Accept")',
+    'button:has-text("I agree")',
+    'button:has-text("Got it")',
+    # Reddit specific
+    '#accept-all-cookies',
+    '[data-testid="accept-all-cookies"]',
+    'button:has-text("Accept all")',
+)
+
+# Single union selector so banner hunting is one round-trip, not one
+# (up to 1s) click attempt per selector
+_COOKIE_UNION = ":is(" + ", ".join(_COOKIE_SELECTORS) + "):visible"
+
 class Browser:
     """Main browser controller class."""
     
@@ -30,89 +80,86 @@ class Browser:
         self.element_finder = ElementFinder(agent)
         self.executor = CommandExecutor()
         self.agent = agent
-        
+        # Last serialized DOM as (url, content); serializing the full DOM is
+        # one of the slowest Playwright calls, so reuse it until it goes stale
+        self._content_cache: Optional[tuple] = None
+        self._content_dirty = True
+        # URL the cookie banner sweep last ran against
+        self._last_banner_url: Optional[str] = None
+
         # Setup popup and dialog handling
         asyncio.create_task(self._setup_popup_handling())
 
+    async def _get_page_content(self) -> str:
+        """Return page.content(), reusing the cached copy while it is fresh"""
+        if (not self._content_dirty and self._content_cache
+                and self._content_cache[0] == self.page.url):
+            return self._content_cache[1]
+        content = await self.page.content()
+        self._content_cache = (self.page.url, content)
+        self._content_dirty = False
+        return content
+
     async def _add_human_delay(self, min_ms=100, max_ms=300):
         """Add random delay to simulate human behavior."""
+        if not self.config.human_delay_enabled:
+            return
         delay = random.randint(min_ms, max_ms)
-        await self.page.wait_for_timeout(delay)
+        # Sleep on the event loop; wait_for_timeout is a full IPC round-trip
+        # to the browser just to do the same thing
+        await asyncio.sleep(delay / 1000.0)
 
     async def _setup_popup_handling(self):
         """Setup handlers for popups and dialogs."""
         # Handle new popup windows
         self.page.on("popup", lambda popup: popup.close())
-        
+
         # Auto-dismiss dialogs (alert, confirm, prompt)
         self.page.on("dialog", lambda dialog: dialog.dismiss())
-        
-        # Setup route to block unwanted resources
-        await self.page.route("**/*", self._handle_route)
-
-    async def _handle_route(self, route):
-        """Handle network requests and block unwanted resources."""
-        request = route.request
-        resource_type = request.resource_type
-        
-        # Block known ad/tracking domains
-        blocked_domains = [
-            "google-analytics.com",
-            "doubleclick.net",
-            "facebook.com",
-            "adnxs.com",
-            # Add more ad domains as needed
-        ]
-        
-        # Block unwanted resource types
-        blocked_resources = [
-            "image",  # Optional: block images to speed up browsing
-            "media",
-            "font",
-            "other"
-        ]
-        
-        url = request.url.lower()
-        
-        if any(domain in url for domain in blocked_domains):
-            await route.abort()
-        elif resource_type in blocked_resources:
-            await route.abort()
-        else:
-            await route.continue_()
+
+        # Invalidate the cached DOM snapshot on navigation
+        self.page.on("framenavigated",
+                     lambda _: setattr(self, "_content_dirty", True))
+
+        # Block at the context level with native URL globs — requests that
+        # match no pattern stay on the no-callback fast path in the driver
+        # instead of round-tripping through Python
+        extensions = [ext for resource in self.config.block_resources
+                      for ext in _RESOURCE_EXTENSIONS.get(resource, ())]
+        if extensions:
+            await self.context.route(
+                "**/*.{" + ",".join(extensions) + "}*", _abort_route)
+        for host in _BLOCKED_HOSTS:
+            await self.context.route(f"**://{host}/**", _abort_route)
+            await self.context.route(f"**://*.{host}/**", _abort_route)
 
     async def _handle_cookie_banners(self):
         """Attempt to handle common cookie consent banners."""
-        cookie_button_selectors = [
-            '[id*="cookie"] button',
-            '[class*="cookie"] button',
-            '[id*="consent"] button',
-            '[class*="consent"] button',
-            'button[contains(text(), "Accept")]',
-            'button[contains(text(), "I agree")]',
-            'button[contains(text(), "Got it")]',
-            # Reddit specific
-            '#accept-all-cookies',
-            '[data-testid="accept-all-cookies"]',
-            'button:has-text("Accept all")',
-        ]
-        
-        for selector in cookie_button_selectors:
-            try:
-                await self.page.click(selector, timeout=1000)
-                await self._add_human_delay()
-            except:
-                continue
+        # Banners appear once per page, so skip the sweep when the URL
+        # hasn't changed since the last attempt
+        if self.page.url == self._last_banner_url:
+            return
+        self._last_banner_url = self.page.url
+        try:
+            await self.page.locator(_COOKIE_UNION).first.click(timeout=500)
+            await self._add_human_delay()
+        except:
+            pass
 
     async def interact(self, command: str) -> dict:
         """Execute a natural language command using LLM guidance"""
         try:
             # Get current page content
-            page_content = await self.page.content()
+            page_content = await self._get_page_content()
             
-            # Get structured plan from LLM
-            logger.info(f"\nProcessing command: {command}")
-            plan = await self.agent.plan_actions(command, page_content)
+            # Get the structured plan from the LLM while sweeping for cookie
+            # banners — the two largest latency sources overlap instead of
+            # running back to back
+            logger.info("\nProcessing command: %s", command)
+            plan, _ = await asyncio.gather(
+                self.agent.plan_actions(command, page_content),
+                self._handle_cookie_banners(),
+            )
             
             if not plan or not plan.get("steps"):
                 return {
@@ -123,22 +170,27 @@ class Browser:
             
             # Parse plan into executable actions
             actions = self.parser.parse_plan(plan)
-            logger.info(f"Parsed actions: {actions}")
+            logger.info("Parsed actions: %s", actions)
             
             # Execute each action
             for action in actions:
-                logger.info(f"Executing action: {action}")
-                # Handle cookie banners and popups before each action
-                await self._handle_cookie_banners()
+                logger.info("Executing action: %s", action)
                 result = await self.executor.execute_action(self.page, action)
-                logger.info(f"Action result: {result}")
+                logger.info("Action result: %s", result)
+                # Anything except a pure wait can mutate the DOM
+                if action["action"] != "wait":
+                    self._content_dirty = True
+                # Fresh pages are the only place new banners show up
+                if action["action"] in ("navigation", "submit"):
+                    await self._handle_cookie_banners()
                 
                 if not result["success"]:
-                    logger.error(f"Action failed: {result['message']}")
+                    logger.error("Action failed: %s", result['message'])
                     return result
                     
-                logger.info(f"Successfully executed action: {action['action']}")
-                await self._add_human_delay()
+                logger.info("Successfully executed action: %s", action['action'])
+                if action["action"] in _HUMAN_DELAY_ACTIONS:
+                    await self._add_human_delay()
             
             return {
                 "success": True,
@@ -146,62 +198,13 @@ class Browser:
             }
             
         except Exception as e:
-            logger.error(f"Error during interaction: {e}")
+            logger.error("Error during interaction: %s", e)
             return {
                 "success": False,
                 "message": f"Unexpected error: {str(e)}",
                 "error_type": "UnexpectedError"
             }
 
-    async def _execute_action(self, action: Dict) -> Dict:
-        """Execute a single browser action"""
-        try:
-            action_type = action["action"]
-            
-            if action_type == "goto":
-                response = await self.page.goto(
-                    action["url"],
-                    wait_until="networkidle",
-                    timeout=30000
-                )
-                await self._handle_cookie_banners()
-                return {"success": bool(response and response.status < 400)}
-                
-            elif action_type == "click":
-                await self.page.click(action["selector"])
-                return {"success": True}
-                
-            elif action_type == "fill":
-                await self.page.fill(action["selector"], action["text"])
-                return {"success": True}
-                
-            elif action_type == "wait":
-                await self.page.wait_for_timeout(action["seconds"] * 1000)
-                return {"success": True}
-                
-            elif action_type == "submit":
-                await self.page.click(action["selector"])
-                await self.page.wait_for_load_state("networkidle")
-                return {"success": True}
-                
-            elif action_type == "dismiss_popup":
-                await self._handle_cookie_banners()
-                return {"success": True}
-                
-            return {
-                "success": False,
-                "message": f"Unknown action type: {action_type}",
-                "error_type": "UnknownAction"
-            }
-            
-        except Exception as e:
-            logger.error(f"Action failed: {e}")
-            return {
-                "success": False,
-                "message": f"Action failed: {str(e)}",
-                "error_type": "ActionError"
-            }
-
     async def close(self):
         """Close the browser and all its resources."""
         await self.browser.close()
@@ -52,6 +52,14 @@ class BrowserConfig:
             "is_mobile": False,
         }
         
+        # Resource types aborted during routing to cut page-load latency.
+        # Tests that need images (e.g. image-search flows) can remove entries.
+        self.block_resources = {"image", "media", "font", "other"}
+
+        # Randomized pause between actions to look human; costs 100-300 ms
+        # per action, so production automation can switch it off
+        self.human_delay_enabled = True
+
         # Navigation timeout in milliseconds
         self.navigation_timeout = 30000
         
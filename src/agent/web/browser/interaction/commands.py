@@ -1,6 +1,22 @@
-from typing import Protocol, Dict, Any
-from playwright.async_api import Page
+from __future__ import annotations
+
+from typing import Protocol, Dict, Any, TYPE_CHECKING
 from .errors import AuthenticationError
+import re
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+# Common error banner selectors, built once instead of per login attempt
+_ERROR_SELECTOR = ", ".join((
+    '.error-message',
+    '#error-message',
+    '.alert-error',
+    '[role="alert"]',
+))
+# One case-insensitive scan of the banner text instead of a lowercased
+# copy plus one substring search per keyword
+_ERROR_RE = re.compile(r"\b(?:invalid|incorrect|failed|error)\b", re.IGNORECASE)
 
 class Command(Protocol):
     """Protocol for browser commands."""
@@ -53,20 +69,12 @@ class LoginCommand:
                 # Wait for either success or error indicators
                 await page.wait_for_load_state('networkidle')
                 
-                # Check for common error messages
-                error_selectors = [
-                    '.error-message',
-                    '#error-message',
-                    '.alert-error',
-                    '[role="alert"]'
-                ]
-                
-                for selector in error_selectors:
-                    error_element = await page.query_selector(selector)
-                    if error_element:
-                        error_text = await error_element.text_content()
-                        if error_text and any(keyword in error_text.lower() 
-                                            for keyword in ['invalid', 'incorrect', 'failed', 'error']):
+                # Check for common error messages with a single combined
+                # locator — one round-trip in the no-banner common case
+                error_locator = page.locator(_ERROR_SELECTOR)
+                if await error_locator.count():
+                    for error_text in await error_locator.all_text_contents():
+                        if error_text and _ERROR_RE.search(error_text):
                             raise AuthenticationError(f"Login failed: {error_text}")
 
                 return {
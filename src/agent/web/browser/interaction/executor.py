@@ -1,178 +1,364 @@
-from typing import Dict, List
+from __future__ import annotations
+
+from typing import Dict, List, TYPE_CHECKING
+import asyncio
+import functools
+import hashlib
+import json
 import logging
-from playwright.async_api import TimeoutError, Page
-from dotenv import load_dotenv
+import random
 import os
 
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
 logger = logging.getLogger("ai-browser-agent")
 
+_dotenv_loaded = False
+
+
+def _ensure_dotenv():
+    """Load .env once per process; re-parsing it per executor is waste"""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        # Imported here so importing this module (e.g. for the parser
+        # alone) doesn't pay dotenv's file-scanning bootstrap
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
+
+
+@functools.lru_cache(maxsize=128)
+def _env_value(name: str) -> str:
+    """Cached environment lookup; env vars don't change mid-run"""
+    return os.getenv(name, "")
+
+# Selector syntax document.querySelector cannot evaluate
+_NON_CSS_MARKERS = ("text=", ":has-text(", "xpath=", ">>")
+
+
+async def _wait_visible(page: Page, selector: str, timeout_ms: int):
+    """Wait for the selector's element to become visible and return it
+
+    Plain CSS selectors are watched with wait_for_function and
+    polling='mutation', which reacts to actual DOM mutations instead of
+    Playwright's fixed ~100ms polling loop. Engine-specific selectors fall
+    back to wait_for_selector.
+    """
+    if any(marker in selector for marker in _NON_CSS_MARKERS):
+        return await page.wait_for_selector(
+            selector, state="visible", timeout=timeout_ms)
+    expr = ("() => { const e = document.querySelector(%s);"
+            " return e && e.offsetParent !== null; }" % json.dumps(selector))
+    await page.wait_for_function(expr, polling="mutation", timeout=timeout_ms)
+    return await page.query_selector(selector)
+
 class CommandExecutor:
     """Executes browser commands based on LLM-provided strategies"""
     
-    def __init__(self):
-        load_dotenv()  # Load environment variables
+    def __init__(self, parallel_fills: bool = True):
+        _ensure_dotenv()
+        # Run consecutive independent type actions concurrently; disable for
+        # sites whose JS validation depends on strict field order
+        self.parallel_fills = parallel_fills
+        # O(1) dispatch table instead of a cascade of string compares
+        self._handlers = {
+            "navigation": self._navigate,
+            "click": self._click,
+            "type": self._type,
+            "wait": self._wait,
+            "submit": self._submit,
+            "press": self._press,
+        }
 
     def _resolve_env_value(self, value: str) -> str:
         """Resolve value from environment variables if needed"""
         if isinstance(value, str) and value.startswith("ENV:"):
-            env_var = value.split("ENV:")[1]
-            return os.getenv(env_var, "")
+            return _env_value(value[4:])
         return value
 
     async def execute_action(self, page: Page, action: Dict) -> Dict:
         """Execute a single browser action"""
         try:
             action_type = action["action"]
-            
-            # Resolve any ENV variables in the value
-            if "value" in action:
-                action["value"] = self._resolve_env_value(action["value"])
-            
-            if action_type == "navigation":
-                logger.info(f"Navigating to: {action['value']}")
-                response = await page.goto(
-                    action["value"],
-                    # wait_until="networkidle",
-                    timeout=60000
-                )
-                # Wait for page to be ready
-                await page.wait_for_load_state("domcontentloaded")
-                success = bool(response and response.status < 400)
-                logger.info(f"Navigation {'successful' if success else 'failed'}")
-                return {"success": success}
-                
-            elif action_type == "click":
-                for selector in action["selectors"]:
-                    try:
-                        logger.info(f"Attempting to click: {selector}")
-                        element = await page.wait_for_selector(
-                            selector,
-                            state="visible",
-                            timeout=10000
-                        )
-                        if element:
-                            await element.click()
-                            logger.info(f"Successfully clicked: {selector}")
-                            return {"success": True}
-                    except Exception as e:
-                        logger.error(f"Click action failed for selector {selector}: {e}")
-                        continue
-                return {"success": False, "message": "Click action failed for all selectors"}
-                
-            elif action_type == "type":
-                for selector in action["selectors"]:
-                    try:
-                        logger.info(f"Attempting to type into: {selector}")
-                        element = await page.wait_for_selector(
-                            selector,
-                            state="visible",
-                            timeout=10000
-                        )
-                        if element:
-                            await element.fill(action["value"])
-                            logger.info(f"Successfully typed into: {selector}")
-                            return {"success": True}
-                    except Exception as e:
-                        logger.error(f"Type action failed for selector {selector}: {e}")
-                        continue
-                return {"success": False, "message": "Type action failed for all selectors"}
-                
-            elif action_type == "wait":
-                if action.get("selectors"):
-                    logger.info(f"Waiting for selectors: {action['selectors']}")
-                    for selector in action["selectors"]:
-                        try:
-                            await page.wait_for_selector(
-                                selector,
-                                state="visible",
-                                timeout=int(action["value"])
-                            )
-                            logger.info(f"Successfully found selector: {selector}")
-                            return {"success": True}
-                        except TimeoutError:
-                            logger.warning(f"Timeout waiting for selector: {selector}")
-                            continue
-                    return {"success": False, "message": "Wait condition not met"}
-                else:
-                    logger.info(f"Waiting for {action['value']}ms")
-                    await page.wait_for_timeout(int(action["value"]) * 1000)
-                    logger.info("Wait completed")
-                    return {"success": True}
-                
-            elif action_type == "submit":
-                # Try different submit strategies
-                try:
-                    # First try to submit using Enter key on active element
-                    await page.keyboard.press('Enter')
-                    await page.wait_for_load_state("networkidle")
-                    return {"success": True}
-                except Exception:
-                    # If Enter key doesn't work, try clicking submit buttons/forms
-                    for selector in action["selectors"]:
-                        try:
-                            element = await page.wait_for_selector(
-                                selector,
-                                state="visible",
-                                timeout=10000
-                            )
-                            if element:
-                                await element.click()
-                                await page.wait_for_load_state("networkidle")
-                                return {"success": True}
-                        except Exception as e:
-                            logger.error(f"Submit action failed for selector {selector}: {e}")
-                            continue
-                return {"success": False, "message": "Submit action failed"}
-                
-            elif action_type == "press":
-                try:
-                    key = action["value"]
-                    await page.keyboard.press(key)
-                    # await page.wait_for_load_state("networkidle")
-                    logger.info(f"Successfully pressed key: {key}")
-                    return {"success": True}
-                except Exception as e:
-                    logger.error(f"Press action failed: {e}")
-                    return {"success": False, "message": f"Press action failed: {str(e)}"}
-                
-            return {
-                "success": False,
-                "message": f"Unknown action type: {action_type}",
-                "error_type": "UnknownAction"
-            }
-            
+
+            # Resolve any ENV variables in the value. Plans normalized up
+            # front skip this; the copy keeps the caller's dict untouched
+            value = action.get("value")
+            if isinstance(value, str) and value.startswith("ENV:"):
+                action = {**action, "value": self._resolve_env_value(value)}
+
+            handler = self._handlers.get(action_type)
+            if handler is None:
+                return {
+                    "success": False,
+                    "message": f"Unknown action type: {action_type}",
+                    "error_type": "UnknownAction"
+                }
+            return await handler(page, action)
+
         except Exception as e:
-            logger.error(f"Action execution failed: {e}")
+            logger.error("Action execution failed: %s", e)
             return {
                 "success": False,
                 "message": f"Action failed: {str(e)}",
                 "error_type": "ActionError"
             }
 
+    async def _navigate(self, page: Page, action: Dict) -> Dict:
+        logger.info("Navigating to: %s", action['value'])
+        response = await page.goto(
+            action["value"],
+            # wait_until="networkidle",
+            timeout=60000
+        )
+        # Wait for page to be ready
+        await page.wait_for_load_state("domcontentloaded")
+        success = bool(response and response.status < 400)
+        logger.info("Navigation %s", 'successful' if success else 'failed')
+        return {"success": success}
+
+    @staticmethod
+    async def _with_backoff(coro_factory, base: float = 1.0, cap: float = 10.0,
+                            jitter: float = 0.5):
+        """Retry a timeout-bounded coroutine with exponential backoff
+
+        ``coro_factory`` receives the attempt's timeout in milliseconds;
+        attempts grow 1s, 2s, 4s... with random jitter and their sum stays
+        within ``cap``, so a quickly-appearing element is found in the first
+        short attempt instead of committing the whole budget up front. Only
+        TimeoutError is retried; other exceptions are unrecoverable and
+        propagate immediately.
+        """
+        budget = cap
+        attempt = 0
+        while True:
+            timeout = min(base * 2 ** attempt, cap)
+            timeout = min(timeout * (1 + random.random() * jitter), budget)
+            try:
+                return await coro_factory(int(timeout * 1000))
+            except TimeoutError:
+                budget -= timeout
+                if budget <= 0:
+                    raise
+                attempt += 1
+
+    @staticmethod
+    async def _first_visible_element(page: Page, selectors: List[str],
+                                     timeout_ms: int = 10000):
+        """Race the selectors and return the first visible element
+
+        The serial loop this replaces spent the full timeout on every
+        missing selector before trying the next one. Raises TimeoutError
+        if no selector resolves within the timeout.
+        """
+        if not selectors:
+            raise TimeoutError("no selectors to wait for")
+        tasks = [
+            asyncio.create_task(_wait_visible(page, s, timeout_ms))
+            for s in selectors
+        ]
+        try:
+            done, pending = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_COMPLETED)
+            # If the first finisher failed, keep waiting on the rest
+            while pending and all(t.exception() for t in done):
+                more_done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                done |= more_done
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            if not task.exception() and task.result():
+                return task.result()
+        raise TimeoutError(f"no selector became visible: {selectors}")
+
+    async def _click(self, page: Page, action: Dict) -> Dict:
+        logger.info("Attempting to click one of: %s", action['selectors'])
+        try:
+            element = await self._with_backoff(
+                lambda timeout_ms: self._first_visible_element(
+                    page, action["selectors"], timeout_ms))
+        except TimeoutError:
+            return {"success": False,
+                    "message": "Click action failed for all selectors"}
+        await element.click()
+        logger.info("Successfully clicked")
+        return {"success": True}
+
+    async def _type(self, page: Page, action: Dict) -> Dict:
+        logger.info("Attempting to type into one of: %s", action['selectors'])
+        try:
+            element = await self._with_backoff(
+                lambda timeout_ms: self._first_visible_element(
+                    page, action["selectors"], timeout_ms))
+        except TimeoutError:
+            return {"success": False,
+                    "message": "Type action failed for all selectors"}
+        await element.fill(action["value"])
+        logger.info("Successfully typed")
+        return {"success": True}
+
+    async def _wait(self, page: Page, action: Dict) -> Dict:
+        if action.get("selectors"):
+            # Race the selectors so a bad first selector doesn't burn the
+            # whole timeout before the good one is even tried
+            logger.info("Waiting for selectors: %s", action['selectors'])
+            if await self._wait_any_selector(
+                    page, action["selectors"], int(action["value"]),
+                    state="visible"):
+                return {"success": True}
+            return {"success": False, "message": "Wait condition not met"}
+
+        value = action.get("value", "")
+        if isinstance(value, str) and value and not value.isdigit():
+            # The planner sometimes puts a selector in value; waiting on it
+            # returns as soon as the element is ready instead of sleeping a
+            # fixed interval
+            logger.info("Waiting for selector: %s", value)
+            await page.wait_for_selector(value, timeout=10000)
+            logger.info("Wait completed")
+            return {"success": True}
+        # Blind sleep requested — treat it as "wait for the page to settle"
+        # and return as soon as the DOM stops changing, with the requested
+        # duration as the upper bound
+        logger.info("Waiting up to %sms for page to settle", value)
+        await self._wait_for_condition(page, int(value))
+        logger.info("Wait completed")
+        return {"success": True}
+
+    @staticmethod
+    async def _wait_for_condition(page: Page, timeout_ms: int) -> None:
+        """Wait until the DOM stops changing, with an adaptive poll interval
+
+        Polls a cheap content fingerprint (length plus the first 4KB,
+        hashed), starting at 100ms and doubling up to 1s while the page
+        keeps changing. Returns as soon as two consecutive polls match or
+        the deadline passes, so a settled page costs ~200ms instead of the
+        full requested sleep.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_ms / 1000.0
+        interval = 0.1
+        last_digest = None
+        while True:
+            content = await page.content()
+            digest = hashlib.blake2b(
+                f"{len(content)}\x00{content[:4096]}".encode(),
+                digest_size=8).digest()
+            if digest == last_digest:
+                return
+            last_digest = digest
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 2, 1.0)
+
+    @staticmethod
+    async def _check_success(page: Page, action: Dict):
+        """Wait for the planner-specified success selector, when given"""
+        success_selector = action.get("success_selector")
+        if success_selector:
+            await page.wait_for_selector(success_selector, timeout=10000)
+
+    async def _submit(self, page: Page, action: Dict) -> Dict:
+        # Try different submit strategies. The navigation wait is armed
+        # before the trigger fires so a fast navigation can't complete in
+        # the gap between two separate awaits.
+        try:
+            # First try to submit using Enter key on active element
+            async with page.expect_navigation(wait_until="domcontentloaded",
+                                              timeout=15000):
+                await page.keyboard.press('Enter')
+            await self._check_success(page, action)
+            return {"success": True}
+        except Exception:
+            # If Enter key doesn't work, try clicking submit buttons/forms
+            try:
+                element = await self._first_visible_element(
+                    page, action["selectors"])
+                if element:
+                    async with page.expect_navigation(
+                            wait_until="domcontentloaded", timeout=15000):
+                        await element.click()
+                    await self._check_success(page, action)
+                    return {"success": True}
+            except Exception as e:
+                logger.error("Submit action failed: %s", e)
+        return {"success": False, "message": "Submit action failed"}
+
+    async def _press(self, page: Page, action: Dict) -> Dict:
+        try:
+            key = action["value"]
+            await page.keyboard.press(key)
+            # await page.wait_for_load_state("networkidle")
+            logger.info("Successfully pressed key: %s", key)
+            return {"success": True}
+        except Exception as e:
+            logger.error("Press action failed: %s", e)
+            return {"success": False, "message": f"Press action failed: {str(e)}"}
+
+    def _plan_phases(self, actions: List[Dict]) -> List[List[Dict]]:
+        """Group actions into phases that may run concurrently
+
+        Consecutive type actions touching disjoint selectors (e.g. separate
+        form fields) share a phase; anything that changes global page state
+        (navigation, submit, wait, ...) forms a barrier of its own.
+        """
+        phases: List[List[Dict]] = []
+        fill_phase: List[Dict] = []
+        fill_selectors: set = set()
+
+        for action in actions:
+            selectors = set(action.get("selectors", []))
+            if (self.parallel_fills and action["action"] == "type"
+                    and selectors and not (selectors & fill_selectors)):
+                fill_phase.append(action)
+                fill_selectors |= selectors
+                continue
+            if fill_phase:
+                phases.append(fill_phase)
+                fill_phase = []
+                fill_selectors = set()
+            phases.append([action])
+        if fill_phase:
+            phases.append(fill_phase)
+        return phases
+
     async def execute_plan(self, page, plan: Dict) -> Dict:
         """Execute a complete plan of actions"""
         try:
-            for step in plan.get("steps", []):
-                action_type = step["action_type"]
-                details = step["details"]
-                
-                # Convert step to action format
-                action = {
-                    "action": action_type,
-                    **details
-                }
-                
-                result = await self.execute_action(page, action)
-                if not result["success"]:
-                    return result
-                
+            # Convert steps to action format, resolving ENV placeholders
+            # once up front so execute_action stays a pure fast path
+            actions = [
+                {"action": step["action_type"],
+                 **{key: (self._resolve_env_value(value)
+                          if isinstance(value, str) else value)
+                    for key, value in step["details"].items()}}
+                for step in plan.get("steps", [])
+            ]
+
+            for phase in self._plan_phases(actions):
+                if len(phase) == 1:
+                    results = [await self.execute_action(page, phase[0])]
+                else:
+                    # Independent fills overlap their selector waits
+                    results = await asyncio.gather(
+                        *[self.execute_action(page, action) for action in phase]
+                    )
+                for result in results:
+                    if not result["success"]:
+                        return result
+
             return {
                 "success": True,
                 "message": "Plan executed successfully"
             }
-            
+
         except Exception as e:
-            logger.error(f"Plan execution failed: {e}")
+            logger.error("Plan execution failed: %s", e)
             return {
                 "success": False,
                 "message": f"Plan execution failed: {str(e)}",
@@ -182,13 +368,18 @@ class CommandExecutor:
     async def execute(self, page, command_data: Dict) -> Dict:
         """Execute a series of actions based on LLM guidance."""
         try:
+            # Index selector groups once so each action is an O(1) lookup
+            # instead of a scan over all groups
+            selector_map = {group["element"]: group["selectors"]
+                            for group in command_data["selectors"]}
+
             # Execute each action in sequence
             for action in command_data["actions"]:
-                await self._execute_action(page, action, command_data["selectors"])
+                await self._execute_action(page, action, selector_map)
 
             # Verify success
             success = await self._verify_success(page, command_data["verification"])
-            
+
             return {
                 "success": success,
                 "message": "Command executed successfully" if success else "Command execution failed"
@@ -199,37 +390,55 @@ class CommandExecutor:
                 "message": f"Error executing command: {str(e)}"
             }
 
-    async def _execute_action(self, page, action: Dict, selectors: List[Dict]):
+    async def _execute_action(self, page, action: Dict, selector_map: Dict[str, List[str]]):
         """Execute a single action using multiple selector attempts."""
-        element_selectors = self._get_selectors_for_element(selectors, action["element"])
-        
-        for selector in element_selectors:
-            try:
-                if action["type"] == "click":
-                    await page.click(selector)
-                    break
-                elif action["type"] == "type":
-                    await page.fill(selector, action["value"])
-                    break
-                elif action["type"] == "press":
-                    await page.keyboard.press(action["key"])
-                    break
-            except:
-                continue
+        if action["type"] == "press":
+            await page.keyboard.press(action["key"])
+            return
+
+        element_selectors = selector_map.get(action.get("element"), [])
+        if not element_selectors:
+            return
+
+        # One combined locator lets Playwright try every selector in a
+        # single call rather than one failed attempt per selector
+        locator = page.locator(", ".join(element_selectors)).first
+        try:
+            if action["type"] == "click":
+                await locator.click()
+            elif action["type"] == "type":
+                await locator.fill(action["value"])
+        except Exception:
+            pass
+
+    @staticmethod
+    async def _wait_any_selector(page, selectors: List[str], timeout_ms: int,
+                                 state: str = "attached") -> bool:
+        """Wait for the first of several selectors to appear
+
+        Probing the selectors concurrently bounds the worst case at one
+        timeout instead of one timeout per selector.
+        """
+        if not selectors:
+            return False
+        tasks = [
+            asyncio.create_task(
+                page.wait_for_selector(s, state=state, timeout=timeout_ms))
+            for s in selectors
+        ]
+        try:
+            done, pending = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for task in tasks:
+                task.cancel()
+        return any(not task.exception() for task in done)
 
     async def _verify_success(self, page, verification: Dict) -> bool:
         """Verify the command executed successfully."""
-        for selector in verification["success_indicators"]:
-            try:
-                await page.wait_for_selector(selector, timeout=verification["timeout_ms"])
-                return True
-            except:
-                continue
-        return False
-
-    def _get_selectors_for_element(self, selectors: List[Dict], element_name: str) -> List[str]:
-        """Get all selectors for a given element."""
-        for selector_group in selectors:
-            if selector_group["element"] == element_name:
-                return selector_group["selectors"]
-        return [] 
\ No newline at end of file
+        return await self._wait_any_selector(
+            page,
+            verification["success_indicators"],
+            verification["timeout_ms"],
+        )
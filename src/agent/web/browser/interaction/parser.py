@@ -1,8 +1,55 @@
 from typing import Dict, Any, Tuple, List
+import functools
 import re
+import sys
 from .commands import NavigateCommand, ClickCommand, TypeCommand, WaitForCommand, LoginCommand
 from .errors import BrowserError
 
+# Hot patterns compiled once at import instead of per parse call. The two
+# login forms differ only in their leading verb, so one alternation shares
+# the tail and rejects non-login commands on the first few characters.
+_LOGIN_RE = re.compile(
+    r"(?:login|sign in) (?:to |on |at )?(?P<site>[\w.]+) "
+    r"(?:with |using )?username ['\"](?P<username>.*?)['\"] "
+    r"(?:and |with )?password ['\"](?P<password>.*?)['\"]"
+)
+_TYPE_RE = re.compile(r"type ['\"](.*?)['\"] into (.*)")
+
+# Fallback selector templates for descriptions with no canned mapping
+_INPUT_FALLBACK = ("input[placeholder*='{d}' i]", "input[aria-label*='{d}' i]")
+_ELEMENT_FALLBACK = "text={d}, [aria-label*='{d}'], [name*='{d}']"
+
+# Canonical selector tables, built once with interned strings so repeated
+# parses share the same objects and downstream equality/hash checks are
+# pointer comparisons
+_INPUT_SELECTORS = {
+    "search": tuple(sys.intern(s) for s in (
+        "input[name='q']",
+        "input[title='Search']",
+        "input[type='search']",
+        "input[aria-label*='search' i]",
+        "textarea[name='q']",
+        "textarea[aria-label*='search' i]"
+    )),
+    "username": tuple(sys.intern(s) for s in (
+        "input[type='text'][name*='user' i]",
+        "input[name='username']",
+        "input[id*='username' i]"
+    )),
+    "password": tuple(sys.intern(s) for s in (
+        "input[type='password']",
+        "input[name*='pass' i]",
+        "input[id*='password' i]"
+    )),
+}
+
+_ELEMENT_SELECTORS = {
+    "search button": sys.intern("button[type='submit'], button:has-text('Search')"),
+    "search results": sys.intern("#search-results, .search-results, [aria-label='Search results']"),
+    "login button": sys.intern("button:has-text('Login'), button:has-text('Sign in')"),
+    "submit button": sys.intern("button[type='submit']"),
+}
+
 class CommandParser:
     """Parses natural language commands into executable browser commands."""
 
@@ -12,103 +59,97 @@ class CommandParser:
         and its parameters.
         """
         command = command.lower().strip()
-        
-        # Login command patterns
-        login_patterns = [
-            r"login (?:to |on |at )?(?P<site>[\w.]+) (?:with |using )?username ['\"](?P<username>.*?)['\"] (?:and |with )?password ['\"](?P<password>.*?)['\"]",
-            r"sign in (?:to |on |at )?(?P<site>[\w.]+) (?:with |using )?username ['\"](?P<username>.*?)['\"] (?:and |with )?password ['\"](?P<password>.*?)['\"]"
-        ]
-        
-        for pattern in login_patterns:
-            match = re.match(pattern, command)
-            if match:
-                data = match.groupdict()
-                return LoginCommand(), {
-                    "username": data["username"],
-                    "password": data["password"],
-                    "site": data["site"].replace(".com", "")
-                }
-        
-        # Navigation commands
-        if command.startswith("go to "):
-            url = command[6:].strip()
-            # Add https if no protocol specified
-            if not url.startswith(("http://", "https://")):
-                url = f"https://{url}"
-            return NavigateCommand(), {"url": url}
-        
-        # Type commands
-        elif "type" in command and "into" in command:
-            match = re.search(r"type ['\"](.*?)['\"] into (.*)", command)
-            if match:
-                text, selector = match.groups()
-                selector = self._get_selector_for_input(selector)
-                return TypeCommand(), {"selector": selector, "text": text}
-        
-        # Click commands
-        elif command.startswith("click"):
-            element = command[6:].strip()
-            selector = self._get_selector_for_element(element)
-            return ClickCommand(), {"selector": selector}
-        
-        # Wait commands
-        elif command.startswith("wait for"):
-            element = command[9:].strip()
-            selector = self._get_selector_for_element(element)
-            return WaitForCommand(), {"selector": selector}
-        
+
+        # O(1) dispatch on the leading verb; each handler only runs (and
+        # only evaluates its regex) for commands that can match it
+        handler = self._DISPATCH.get(command.partition(" ")[0])
+        if handler is not None:
+            result = handler(self, command)
+            if result is not None:
+                return result
+
         raise BrowserError(f"Could not parse command: {command}")
 
-    def _get_selector_for_input(self, description: str) -> List[str]:
-        """Get a list of possible selectors for an input field."""
-        description = description.lower()
-        
-        # Common input field patterns
-        selectors = {
-            "search": [
-                "input[name='q']",
-                "input[title='Search']",
-                "input[type='search']",
-                "input[aria-label*='search' i]",
-                "textarea[name='q']",
-                "textarea[aria-label*='search' i]"
-            ],
-            "username": [
-                "input[type='text'][name*='user' i]",
-                "input[name='username']",
-                "input[id*='username' i]"
-            ],
-            "password": [
-                "input[type='password']",
-                "input[name*='pass' i]",
-                "input[id*='password' i]"
-            ]
+    def _parse_login(self, command: str):
+        match = _LOGIN_RE.match(command)
+        if not match:
+            return None
+        data = match.groupdict()
+        return LoginCommand(), {
+            "username": data["username"],
+            "password": data["password"],
+            "site": data["site"].replace(".com", "")
         }
-        
-        for key, selector_list in selectors.items():
+
+    def _parse_navigate(self, command: str):
+        if not command.startswith("go to "):
+            return None
+        url = command[6:].strip()
+        # Add https if no protocol specified
+        if not url.startswith(("http://", "https://")):
+            url = f"https://{url}"
+        return NavigateCommand(), {"url": url}
+
+    def _parse_type(self, command: str):
+        # Cheap single-pass prefix check before the regex runs at all
+        if not command.startswith(("type '", 'type "')):
+            return None
+        match = _TYPE_RE.match(command)
+        if not match:
+            return None
+        text, selector = match.groups()
+        selector = self._get_selector_for_input(selector)
+        return TypeCommand(), {"selector": selector, "text": text}
+
+    def _parse_click(self, command: str):
+        element = command[6:].strip()
+        selector = self._get_selector_for_element(element)
+        return ClickCommand(), {"selector": selector}
+
+    def _parse_wait(self, command: str):
+        if not command.startswith("wait for"):
+            return None
+        element = command[9:].strip()
+        selector = self._get_selector_for_element(element)
+        return WaitForCommand(), {"selector": selector}
+
+    # First verb token -> handler
+    _DISPATCH = {
+        "login": _parse_login,
+        "sign": _parse_login,
+        "go": _parse_navigate,
+        "type": _parse_type,
+        "click": _parse_click,
+        "wait": _parse_wait,
+    }
+
+    # Plans repeat the same element descriptions, so the selector helpers
+    # are memoized; they return immutable tuples/strings that are safe to
+    # share between cached calls
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _get_selector_for_input(description: str) -> Tuple[str, ...]:
+        """Get a tuple of possible selectors for an input field."""
+        description = description.lower()
+
+        for key, selector_list in _INPUT_SELECTORS.items():
             if key in description:
                 return selector_list
-                
-        return [f"input[placeholder*='{description}' i]", f"input[aria-label*='{description}' i]"]
 
-    def _get_selector_for_element(self, description: str) -> str:
+        return tuple(t.format(d=description) for t in _INPUT_FALLBACK)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _get_selector_for_element(description: str) -> str:
         """Convert element description to a CSS selector."""
         description = description.lower()
-        
-        # Common element patterns
-        selectors = {
-            "search button": "button[type='submit'], button:has-text('Search')",
-            "search results": "#search-results, .search-results, [aria-label='Search results']",
-            "login button": "button:has-text('Login'), button:has-text('Sign in')",
-            "submit button": "button[type='submit']"
-        }
-        
-        for key, selector in selectors.items():
+
+        for key, selector in _ELEMENT_SELECTORS.items():
             if key in description:
                 return selector
-        
+
         # Default to looking for elements with matching text or attributes
-        return f"text={description}, [aria-label*='{description}'], [name*='{description}']"
+        return _ELEMENT_FALLBACK.format(d=description)
 
     def parse_plan(self, plan: Dict) -> List[Dict]:
         """Convert LLM plan into executable browser actions"""
@@ -19,7 +19,7 @@ async def test_executor():
     if not api_key:
         raise ValueError("GOOGLE_API_KEY not found in environment variables")
     
-    agent = GeminiAgent(api_key)
+    agent = GeminiAgent.instance(api_key)
     
     async with async_playwright() as p:
         # Launch browser
@@ -17,7 +17,7 @@ async def test_llm():
     if not api_key:
         raise ValueError("GOOGLE_API_KEY not found in environment variables")
     
-    agent = GeminiAgent(api_key)
+    agent = GeminiAgent.instance(api_key)
     
     # Test cases
     test_commands = [